@@ -1,12 +1,21 @@
 import os
-import wave
-import json
+import sys
+import struct
+import base64
+import orjson
 import logging
 import asyncio
+import atexit
 import threading
+import uuid
 import time
 import re
+import math
+from collections import deque
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
+from functools import lru_cache
+from queue import Queue, Empty, Full
 from typing import Optional, List, Dict
 import pytz
 from dateutil import parser, relativedelta
@@ -18,6 +27,7 @@ except Exception:
     HAS_PYAUDIO = False
 import assemblyai as aai
 from fastapi import FastAPI, WebSocket, Request
+from fastapi.responses import ORJSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
@@ -29,7 +39,7 @@ from assemblyai.streaming.v3 import (
 )
 from google.generativeai import GenerativeModel, configure
 import websockets
-import requests
+import httpx
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -71,11 +81,20 @@ if DEFAULT_GEMINI_API_KEY:
     configure(api_key=DEFAULT_GEMINI_API_KEY)
 
 # Logging
-logging.basicConfig(level=logging.DEBUG, format="%(asctime)s - %(levelname)s - %(message)s")
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 log = logging.getLogger("day23")
 
+# Shared HTTP client, created on startup so connections are pooled across requests
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    app.state.http = httpx.AsyncClient(timeout=10, http2=True)
+    try:
+        yield
+    finally:
+        await app.state.http.aclose()
+
 # FastAPI app
-app = FastAPI(title="AI Voice Agent - Day 23")
+app = FastAPI(title="AI Voice Agent - Day 23", lifespan=lifespan, default_response_class=ORJSONResponse)
 
 # CORS
 app.add_middleware(
@@ -94,43 +113,146 @@ templates = Jinja2Templates(directory="templates")
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-# Audio config (AssemblyAI input is 16000, Murf output is 44100)
+# Audio config (AssemblyAI input is 16000, Murf output is 24000 MP3)
 SAMPLE_RATE = 16000
 CHANNELS = 1
 FORMAT = pyaudio.paInt16 if HAS_PYAUDIO else None
 FRAMES_PER_BUFFER = 1600
+# Only the most recent MAX_RECORD_SECONDS of a session are kept for the saved WAV
+MAX_RECORD_SECONDS = int(os.getenv("MAX_RECORD_SECONDS", "600"))
+MAX_RECORDED_FRAMES = math.ceil(MAX_RECORD_SECONDS * SAMPLE_RATE / FRAMES_PER_BUFFER)
+# Mic frames waiting for the AssemblyAI sender thread (~6s at 100ms per frame)
+AAI_SEND_QUEUE_SIZE = 64
+MURF_AUDIO_FORMAT = "MP3"
+MURF_SAMPLE_RATE = 24000
+
+# PortAudio is initialised once per process; streams are opened per session
+pyaudio_instance = None
+pyaudio_lock = threading.Lock()
+
+def get_pyaudio():
+    global pyaudio_instance
+    with pyaudio_lock:
+        if pyaudio_instance is None:
+            pyaudio_instance = pyaudio.PyAudio()
+            atexit.register(pyaudio_instance.terminate)
+        return pyaudio_instance
 
-# Chat history file
-CHAT_HISTORY_FILE = os.path.join(UPLOAD_DIR, "chat_history.json")
+# Chat history file (one JSON entry per line, append-only)
+CHAT_HISTORY_FILE = os.path.join(UPLOAD_DIR, "chat_history.jsonl")
+# Older releases stored the whole history as a single JSON array
+LEGACY_CHAT_HISTORY_FILE = os.path.join(UPLOAD_DIR, "chat_history.json")
 
-# Utility to save audio
-def save_wav(frames: List[bytes]) -> Optional[str]:
+def dumps_text(data) -> str:
+    """Serialize to a JSON string for websocket text frames."""
+    return orjson.dumps(data).decode()
+
+async def send_json(websocket: WebSocket, data) -> None:
+    """Send a JSON text frame to the client (orjson instead of send_json's stdlib json)."""
+    await websocket.send_text(dumps_text(data))
+
+# Background tasks (e.g. disk writes) kept referenced until they finish
+background_tasks = set()
+
+def run_in_background(coro) -> asyncio.Task:
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# 44-byte PCM WAV header; only the two size fields depend on the recording
+SAMPLE_WIDTH = 2  # 16-bit
+WAV_HEADER = struct.Struct("<4sI4s4sIHHIIHH4sI")
+# writev takes at most IOV_MAX buffers per call; sysconf may not know the
+# name, or report -1 when the limit is indeterminate
+try:
+    IOV_MAX = os.sysconf("SC_IOV_MAX")
+except (AttributeError, ValueError, OSError):
+    IOV_MAX = -1
+if IOV_MAX <= 0:
+    IOV_MAX = 1024
+
+def wav_header(data_size: int) -> bytes:
+    return WAV_HEADER.pack(
+        b"RIFF", 36 + data_size, b"WAVE",
+        b"fmt ", 16, 1, CHANNELS, SAMPLE_RATE,
+        SAMPLE_RATE * CHANNELS * SAMPLE_WIDTH, CHANNELS * SAMPLE_WIDTH, SAMPLE_WIDTH * 8,
+        b"data", data_size,
+    )
+
+def write_wav(path: str, frames: List[bytes]) -> None:
+    header = wav_header(sum(map(len, frames)))
+    if not hasattr(os, "writev"):
+        with open(path, "wb") as f:
+            f.write(header + b"".join(frames))
+        return
+    # Gather-write the header and frames straight from their buffers
+    buffers = [header, *frames]
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+    try:
+        for i in range(0, len(buffers), IOV_MAX):
+            batch = buffers[i:i + IOV_MAX]
+            written = os.writev(fd, batch)
+            expected = sum(map(len, batch))
+            if written < expected:
+                # Short write: finish the rest of this batch the plain way
+                rest = memoryview(b"".join(batch))[written:]
+                while rest:
+                    rest = rest[os.write(fd, rest):]
+    finally:
+        os.close(fd)
+
+# Utility to save audio (the write runs in a worker thread)
+async def save_wav(frames: List[bytes]) -> Optional[str]:
     if not frames:
         return None
     ts = datetime.now().strftime("%Y%m%d_%H%M%S")
     path = os.path.join(UPLOAD_DIR, f"recorded_audio_{ts}.wav")
-    with wave.open(path, "wb") as wf:
-        wf.setnchannels(CHANNELS)
-        wf.setsampwidth(2)  # 16-bit
-        wf.setframerate(SAMPLE_RATE)
-        wf.writeframes(b"".join(frames))
+    await asyncio.to_thread(write_wav, path, frames)
     return path
 
-# Utility to save chat history
-def save_chat_history(user_query: str, ai_response: str) -> bool:
+# Utility to load chat history from disk (called once at startup)
+def load_chat_history() -> List[Dict]:
+    history = []
     try:
-        history = []
         if os.path.exists(CHAT_HISTORY_FILE):
-            with open(CHAT_HISTORY_FILE, "r") as f:
-                history = json.load(f)
+            with open(CHAT_HISTORY_FILE, "rb") as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        history.append(orjson.loads(line))
+        elif os.path.exists(LEGACY_CHAT_HISTORY_FILE):
+            with open(LEGACY_CHAT_HISTORY_FILE, "rb") as f:
+                history = orjson.loads(f.read())
+            # Write to a temp file first so a failed migration never leaves a
+            # partial jsonl file that would hide the legacy one on next start
+            tmp_path = CHAT_HISTORY_FILE + ".tmp"
+            with open(tmp_path, "wb") as f:
+                for entry in history:
+                    f.write(orjson.dumps(entry) + b"\n")
+            os.replace(tmp_path, CHAT_HISTORY_FILE)
+            log.info(f"Migrated {len(history)} chat history entries to {CHAT_HISTORY_FILE}")
+    except Exception as e:
+        log.error(f"Failed to load chat history: {e}")
+    return history
+
+# In-memory chat history; the file on disk is only appended to
+chat_history: List[Dict] = load_chat_history()
+
+def append_chat_history_entry(entry: Dict) -> None:
+    with open(CHAT_HISTORY_FILE, "ab") as f:
+        f.write(orjson.dumps(entry) + b"\n")
+
+# Utility to save chat history (the write runs in a worker thread)
+async def save_chat_history(user_query: str, ai_response: str) -> bool:
+    try:
         entry = {
             "timestamp": datetime.now().isoformat(),
             "user_query": user_query,
             "ai_response": ai_response,
         }
-        history.append(entry)
-        with open(CHAT_HISTORY_FILE, "w") as f:
-            json.dump(history, f, indent=2)
+        chat_history.append(entry)
+        await asyncio.to_thread(append_chat_history_entry, entry)
         log.info(f"Chat history saved: {entry}")
         return True
     except Exception as e:
@@ -140,39 +262,48 @@ def save_chat_history(user_query: str, ai_response: str) -> bool:
 # Utility to get chat history
 @app.get("/chat_history")
 async def get_chat_history():
-    try:
-        if os.path.exists(CHAT_HISTORY_FILE):
-            with open(CHAT_HISTORY_FILE, "r") as f:
-                return json.load(f)
-        return []
-    except Exception as e:
-        log.error(f"Failed to read chat history: {e}")
-        return {"error": str(e)}
+    return chat_history
 
 @app.delete("/chat_history")
 async def clear_chat_history():
     try:
-        if os.path.exists(CHAT_HISTORY_FILE):
-            os.remove(CHAT_HISTORY_FILE)
-            log.info("Chat history cleared")
+        chat_history.clear()
+        for path in (CHAT_HISTORY_FILE, LEGACY_CHAT_HISTORY_FILE):
+            if os.path.exists(path):
+                os.remove(path)
+        log.info("Chat history cleared")
         return {"success": True, "message": "Chat history cleared"}
     except Exception as e:
         log.error(f"Failed to clear chat history: {e}")
         return {"error": str(e)}
 
-# Static context_id
+# Static context_id for the Murf connection; each turn speaks in its own context
 CONTEXT_ID = "static_context_23"
+MURF_VOICE_CONFIG = {"voiceId": "en-US-amara", "style": "Conversational"}
 
 # Weather functionality
-def get_weather_for_location(location: str) -> Dict:
-    """Get weather information for a given location using wttr.in API (free, no key required)."""
+
+# Recent weather lookups: lowercased location -> (fetched_at, weather_info)
+WEATHER_CACHE_TTL = 60  # seconds
+WEATHER_CACHE_SIZE = 256
+weather_cache: Dict[str, tuple] = {}
+
+async def get_weather_for_location(location: str) -> Dict:
+    """Get weather information for a given location using wttr.in API (free, no key required).
+
+    Successful lookups are cached for WEATHER_CACHE_TTL seconds.
+    """
+    cache_key = location.lower().strip()
+    cached = weather_cache.get(cache_key)
+    if cached and time.monotonic() - cached[0] < WEATHER_CACHE_TTL:
+        return cached[1]
     try:
         # Use wttr.in API which is free and doesn't require API key
         weather_url = f"https://wttr.in/{location}?format=j1"
         
-        weather_response = requests.get(weather_url, timeout=10)
+        weather_response = await app.state.http.get(weather_url)
         weather_response.raise_for_status()
-        weather_data = weather_response.json()
+        weather_data = orjson.loads(weather_response.content)
         
         # Extract current weather information
         current_condition = weather_data["current_condition"][0]
@@ -189,46 +320,56 @@ def get_weather_for_location(location: str) -> Dict:
             "pressure": int(current_condition["pressure"])
         }
         
+        if cache_key not in weather_cache and len(weather_cache) >= WEATHER_CACHE_SIZE:
+            # Evict the oldest entry
+            weather_cache.pop(next(iter(weather_cache)), None)
+        weather_cache[cache_key] = (time.monotonic(), weather_info)
         return weather_info
         
-    except requests.exceptions.RequestException as e:
+    except httpx.HTTPError as e:
         log.error(f"Weather API request failed: {e}")
         return {"error": "Failed to fetch weather data"}
     except Exception as e:
         log.error(f"Weather data processing error: {e}")
         return {"error": "Error processing weather data"}
 
+# Common weather-related phrases to remove (compiled once at import)
+LOCATION_PATTERNS = tuple(re.compile(p) for p in (
+    r"what's the weather like in\s+",
+    r"what is the weather in\s+",
+    r"weather in\s+",
+    r"how's the weather in\s+",
+    r"check weather for\s+",
+    r"weather for\s+",
+    r"temperature in\s+",
+    r"forecast for\s+",
+    r"weather at\s+",
+    r"weather of\s+"
+))
+TRAILING_PUNCT_PATTERN = re.compile(r'[?.,!]+$')
+LOCATION_STOPWORDS_PATTERN = re.compile(r'\b(please|now|today|right now)\b')
+IN_LOCATION_PATTERN = re.compile(r'\bin\s+([^?.,!]+)')
+# Every LOCATION_PATTERNS entry contains one of these words
+LOCATION_KEYWORDS = ("weather", "temperature", "forecast")
+
 def extract_location_from_text(text: str) -> Optional[str]:
     """Extract location from user text using simple pattern matching."""
-    # Common weather-related phrases to remove
-    weather_phrases = [
-        r"what's the weather like in\s+",
-        r"what is the weather in\s+",
-        r"weather in\s+",
-        r"how's the weather in\s+",
-        r"check weather for\s+",
-        r"weather for\s+",
-        r"temperature in\s+",
-        r"forecast for\s+",
-        r"weather at\s+",
-        r"weather of\s+"
-    ]
-    
     text_lower = text.lower().strip()
     
-    # Try to match weather patterns
-    for pattern in weather_phrases:
-        match = re.search(pattern, text_lower)
-        if match:
-            location = text_lower[match.end():].strip()
-            # Remove trailing punctuation and common words
-            location = re.sub(r'[?.,!]+$', '', location)
-            location = re.sub(r'\b(please|now|today|right now)\b', '', location).strip()
-            if location:
-                return location
+    # Try to match weather patterns (skipped when no weather keyword is present)
+    if any(keyword in text_lower for keyword in LOCATION_KEYWORDS):
+        for pattern in LOCATION_PATTERNS:
+            match = pattern.search(text_lower)
+            if match:
+                location = text_lower[match.end():].strip()
+                # Remove trailing punctuation and common words
+                location = TRAILING_PUNCT_PATTERN.sub('', location)
+                location = LOCATION_STOPWORDS_PATTERN.sub('', location).strip()
+                if location:
+                    return location
     
     # If no pattern matched, try to extract location after "in"
-    in_match = re.search(r'\bin\s+([^?.,!]+)', text_lower)
+    in_match = IN_LOCATION_PATTERN.search(text_lower) if "in" in text_lower else None
     if in_match:
         location = in_match.group(1).strip()
         if location and len(location) > 2:
@@ -237,58 +378,72 @@ def extract_location_from_text(text: str) -> Optional[str]:
     return None
 
 # Time and Date functionality
+
+# Common timezone mappings
+TIMEZONE_MAPPING = {
+    'new york': 'America/New_York',
+    'nyc': 'America/New_York',
+    'los angeles': 'America/Los_Angeles',
+    'la': 'America/Los_Angeles',
+    'chicago': 'America/Chicago',
+    'london': 'Europe/London',
+    'paris': 'Europe/Paris',
+    'tokyo': 'Asia/Tokyo',
+    'sydney': 'Australia/Sydney',
+    'mumbai': 'Asia/Kolkata',
+    'india': 'Asia/Kolkata',
+    'singapore': 'Asia/Singapore',
+    'beijing': 'Asia/Shanghai',
+    'china': 'Asia/Shanghai',
+    'dubai': 'Asia/Dubai',
+    'moscow': 'Europe/Moscow',
+    'berlin': 'Europe/Berlin',
+    'rome': 'Europe/Rome',
+    'madrid': 'Europe/Madrid',
+    'amsterdam': 'Europe/Amsterdam',
+    'toronto': 'America/Toronto',
+    'vancouver': 'America/Vancouver',
+    'mexico city': 'America/Mexico_City',
+    'sao paulo': 'America/Sao_Paulo',
+    'buenos aires': 'America/Argentina/Buenos_Aires',
+    'cape town': 'Africa/Johannesburg',
+    'cairo': 'Africa/Cairo',
+    'lagos': 'Africa/Lagos',
+    'nairobi': 'Africa/Nairobi'
+}
+
+# Lowercased timezone names, and timezones keyed by their city part
+# ("America/New_York" -> "new york"); the first timezone wins on clashes
+LOWER_TIMEZONES = tuple((tz_name.lower(), tz_name) for tz_name in pytz.all_timezones)
+TIMEZONES_BY_CITY = {
+    tz_name.rsplit("/", 1)[-1].replace("_", " ").lower(): tz_name
+    for tz_name in reversed(pytz.all_timezones)
+}
+
+@lru_cache(maxsize=256)
+def find_timezone(timezone_name_lower: str) -> Optional[str]:
+    """Resolve a lowercased city/region name to a pytz timezone name."""
+    if timezone_name_lower in TIMEZONE_MAPPING:
+        return TIMEZONE_MAPPING[timezone_name_lower]
+    if timezone_name_lower in TIMEZONES_BY_CITY:
+        return TIMEZONES_BY_CITY[timezone_name_lower]
+    # Try to find by common patterns
+    for tz_lower, tz_name in LOWER_TIMEZONES:
+        if timezone_name_lower in tz_lower:
+            return tz_name
+    return None
+
 def get_timezone_time(timezone_name: str) -> Dict:
     """Get current time for a specific timezone."""
     try:
-        # Common timezone mappings
-        timezone_mapping = {
-            'new york': 'America/New_York',
-            'nyc': 'America/New_York',
-            'los angeles': 'America/Los_Angeles',
-            'la': 'America/Los_Angeles',
-            'chicago': 'America/Chicago',
-            'london': 'Europe/London',
-            'paris': 'Europe/Paris',
-            'tokyo': 'Asia/Tokyo',
-            'sydney': 'Australia/Sydney',
-            'mumbai': 'Asia/Kolkata',
-            'india': 'Asia/Kolkata',
-            'singapore': 'Asia/Singapore',
-            'beijing': 'Asia/Shanghai',
-            'china': 'Asia/Shanghai',
-            'dubai': 'Asia/Dubai',
-            'moscow': 'Europe/Moscow',
-            'berlin': 'Europe/Berlin',
-            'rome': 'Europe/Rome',
-            'madrid': 'Europe/Madrid',
-            'amsterdam': 'Europe/Amsterdam',
-            'toronto': 'America/Toronto',
-            'vancouver': 'America/Vancouver',
-            'mexico city': 'America/Mexico_City',
-            'sao paulo': 'America/Sao_Paulo',
-            'buenos aires': 'America/Argentina/Buenos_Aires',
-            'cape town': 'Africa/Johannesburg',
-            'cairo': 'Africa/Cairo',
-            'lagos': 'Africa/Lagos',
-            'nairobi': 'Africa/Nairobi'
-        }
-        
-        timezone_name_lower = timezone_name.lower().strip()
-        
-        # Try to find the timezone
-        if timezone_name_lower in timezone_mapping:
-            tz = pytz.timezone(timezone_mapping[timezone_name_lower])
-        else:
-            # Try to find by common patterns
-            for tz_name in pytz.all_timezones:
-                if timezone_name_lower in tz_name.lower():
-                    tz = pytz.timezone(tz_name)
-                    break
-            else:
-                return {"error": f"Timezone '{timezone_name}' not found"}
+        tz_name = find_timezone(timezone_name.lower().strip())
+        if tz_name is None:
+            return {"error": f"Timezone '{timezone_name}' not found"}
+        tz = pytz.timezone(tz_name)
         
-        current_time = datetime.now(tz)
+        # Read the clock once so both times describe the same instant
         utc_time = datetime.now(pytz.UTC)
+        current_time = utc_time.astimezone(tz)
         
         return {
             "timezone": tz.zone,
@@ -367,53 +522,63 @@ def get_day_of_week(date_str: str) -> Dict:
         log.error(f"Day of week error: {e}")
         return {"error": f"Error getting day of week: {str(e)}"}
 
-def extract_time_query(text: str) -> Optional[Dict]:
-    """Extract time-related queries from user text."""
-    text_lower = text.lower().strip()
-    
+# Time query patterns, grouped by query type. Each pattern has exactly one
+# capturing group holding the query text.
+TIME_QUERY_PATTERNS = (
     # Timezone queries
-    timezone_patterns = [
+    ("timezone", (
         r"what time is it in\s+([^?.,!]+)",
         r"time in\s+([^?.,!]+)",
         r"current time in\s+([^?.,!]+)",
         r"what's the time in\s+([^?.,!]+)",
         r"timezone\s+([^?.,!]+)",
         r"clock in\s+([^?.,!]+)"
-    ]
-    
-    for pattern in timezone_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            timezone = match.group(1).strip()
-            return {"type": "timezone", "query": timezone}
-    
+    )),
     # Date difference queries
-    date_diff_patterns = [
+    ("date_difference", (
         r"how many days (?:until|till|to)\s+([^?.,!]+)",
         r"days (?:until|till|to)\s+([^?.,!]+)",
         r"how long until\s+([^?.,!]+)",
         r"time until\s+([^?.,!]+)",
         r"countdown to\s+([^?.,!]+)"
-    ]
-    
-    for pattern in date_diff_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            target_date = match.group(1).strip()
-            return {"type": "date_difference", "query": target_date}
-    
+    )),
     # Day of week queries
-    day_patterns = [
+    ("day_of_week", (
         r"what day (?:of the week )?(?:is|was|will be)\s+([^?.,!]+)",
         r"day of the week for\s+([^?.,!]+)",
-        r"what day\s+([^?.,!]+)"
-    ]
+        r"what day\s+(?!of the week for)([^?.,!]+)"
+    )),
+)
+
+# All time query patterns combined into one alternation so a transcript is
+# scanned once. Each alternative is wrapped in a named group "<type>_<n>".
+TIME_QUERY_PATTERN = re.compile("|".join(
+    f"(?P<{query_type}_{i}>{pattern})"
+    for query_type, patterns in TIME_QUERY_PATTERNS
+    for i, pattern in enumerate(patterns)
+))
+TIME_QUERY_GROUPS = {
+    f"{query_type}_{i}": (query_type, TIME_QUERY_PATTERN.groupindex[f"{query_type}_{i}"] + 1)
+    for query_type, patterns in TIME_QUERY_PATTERNS
+    for i in range(len(patterns))
+}
+
+# Every time query (including the simple "what time" checks) contains one of these words
+TIME_QUERY_KEYWORDS = ("time", "day", "clock", "until", "countdown")
+
+def extract_time_query(text: str) -> Optional[Dict]:
+    """Extract time-related queries from user text."""
+    text_lower = text.lower().strip()
     
-    for pattern in day_patterns:
-        match = re.search(pattern, text_lower)
-        if match:
-            date = match.group(1).strip()
-            return {"type": "day_of_week", "query": date}
+    # Most utterances are not time queries; skip the regex for them
+    if not any(keyword in text_lower for keyword in TIME_QUERY_KEYWORDS):
+        return None
+    
+    match = TIME_QUERY_PATTERN.search(text_lower)
+    if match:
+        # lastgroup is the outer named group; its query text is the next group
+        query_type, query_group = TIME_QUERY_GROUPS[match.lastgroup]
+        return {"type": query_type, "query": match.group(query_group).strip()}
     
     # Simple time queries
     if any(word in text_lower for word in ["what time", "current time", "time now"]):
@@ -421,10 +586,188 @@ def extract_time_query(text: str) -> Optional[Dict]:
     
     return None
 
-# Initialize Gemini model with persona as system instruction
-model = GenerativeModel(model_name="gemini-2.0-flash", system_instruction=AGENT_PERSONA)
+# Gemini models with persona as system instruction, one per API key. The key
+# itself is applied globally through configure() when it is set.
+gemini_models: Dict[str, GenerativeModel] = {}
+
+def get_gemini_model(api_key: str) -> GenerativeModel:
+    model = gemini_models.get(api_key)
+    if model is None:
+        model = GenerativeModel(model_name="gemini-2.0-flash", system_instruction=AGENT_PERSONA)
+        gemini_models[api_key] = model
+    return model
+
+# Audio frames buffered between the Murf receiver and the client websocket
+AUDIO_QUEUE_SIZE = 16
 
-async def stream_gemini_response(transcript: str, websocket: WebSocket) -> Optional[str]:
+# First byte of each binary audio frame sent to the client
+AUDIO_FRAME_PARTIAL = b"\x00"
+AUDIO_FRAME_FINAL = b"\x01"
+
+# Safety net: seconds of Murf silence after the end-of-input marker before a
+# turn is assumed complete (Murf normally ends the turn with its final message)
+MURF_RECV_TIMEOUT = 1.0
+
+# Gemini text is batched before sending to Murf: a batch is flushed once it
+# reaches MURF_TEXT_BATCH_CHARS or ends at a sentence/clause boundary
+MURF_TEXT_BATCH_CHARS = 120
+MURF_TEXT_BOUNDARIES = (".", "?", "!", ",", ":", ";")
+
+async def pump_gemini_to_murf(response, murf_ws, context_id: str) -> str:
+    """Forward Gemini text to Murf in sentence-sized batches and return the full response."""
+    accumulated_response = ""
+    pending = ""
+    async for chunk in response:
+        if chunk.text:
+            accumulated_response += chunk.text
+            pending += chunk.text
+            if len(pending) >= MURF_TEXT_BATCH_CHARS or pending.rstrip().endswith(MURF_TEXT_BOUNDARIES):
+                if log.isEnabledFor(logging.DEBUG):
+                    log.debug(f"Sending to Murf: {pending}")
+                await murf_ws.send(dumps_text({"text": pending, "context_id": context_id}))
+                pending = ""
+    # The last batch (empty if nothing is left) carries end so Murf flushes
+    # the remaining audio; end is a flag on a text message, not a message of its own
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(f"Sending to Murf (end): {pending}")
+    await murf_ws.send(dumps_text({"text": pending, "context_id": context_id, "end": True}))
+    return accumulated_response
+
+async def pump_murf_audio(murf_ws, audio_queue: asyncio.Queue, send_task: asyncio.Task, context_id: str) -> bool:
+    """Queue Murf audio chunks as client frames until the final chunk arrives.
+
+    A None sentinel is queued once the turn's audio is complete. Returns
+    False if Murf went quiet before sending its final chunk.
+    """
+    completed = False
+    while True:
+        try:
+            murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=MURF_RECV_TIMEOUT)
+        except asyncio.TimeoutError:
+            # Keep waiting while Gemini is still producing text
+            if send_task.done():
+                log.warning("No final chunk from Murf after end of input, ending the turn")
+                # Empty final frame so the client still closes this turn's audio
+                await audio_queue.put(AUDIO_FRAME_FINAL)
+                break
+            continue
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug(f"Received from Murf: {murf_response[:100]}...")
+        murf_data = orjson.loads(murf_response)
+        # Late audio or a final message from an earlier turn's context
+        if murf_data.get("context_id", context_id) != context_id:
+            log.debug(f"Dropping Murf message for stale context {murf_data['context_id']}")
+            continue
+        base64_audio = murf_data.get("audio", "")
+        # Murf ends the turn with {"final": true} and no audio; is_final is the older name
+        is_final = murf_data.get("final", False) or murf_data.get("is_final", False)
+        # Binary frame for the client: 1 flag byte + audio bytes
+        if base64_audio:
+            if audio_queue.full():
+                log.debug("Client is slow to drain audio, applying backpressure to Murf")
+            await audio_queue.put((AUDIO_FRAME_FINAL if is_final else AUDIO_FRAME_PARTIAL) + base64.b64decode(base64_audio))
+        elif is_final:
+            # Bare final frame so the client still closes this turn's audio
+            await audio_queue.put(AUDIO_FRAME_FINAL)
+        if is_final:
+            completed = True
+            break
+    await audio_queue.put(None)
+    return completed
+
+async def pump_audio_to_client(audio_queue: asyncio.Queue, websocket: WebSocket) -> None:
+    """Send queued audio frames to the client until the end-of-turn sentinel."""
+    while True:
+        frame = await audio_queue.get()
+        if frame is None:
+            return
+        try:
+            await websocket.send_bytes(frame)
+            if log.isEnabledFor(logging.DEBUG):
+                log.debug(f"Sent audio to client (Final: {frame[:1] == AUDIO_FRAME_FINAL}, Length: {len(frame) - 1})")
+        except Exception as e:
+            log.error(f"Failed to send audio to client: {e}")
+
+class MurfSession:
+    """A Murf websocket kept open across turns for one client session."""
+
+    def __init__(self):
+        self.ws = None
+        self.api_key = None
+        # Held for a whole turn so overlapping responses don't interleave on the socket
+        self.lock = asyncio.Lock()
+
+    async def get(self):
+        """Return the open Murf websocket, (re)connecting if needed."""
+        api_key = current_api_keys["murf"]
+        if self.ws is not None and (self.ws.closed or self.api_key != api_key):
+            await self.close()
+        if self.ws is None:
+            murf_ws_url = f"{DEFAULT_MURF_WS_URL}?api_key={api_key}&context_id={CONTEXT_ID}&format={MURF_AUDIO_FORMAT}&sample_rate={MURF_SAMPLE_RATE}&channel_type=MONO"
+            log.info(f"Attempting WebSocket connection to: {murf_ws_url}")
+            self.ws = await websockets.connect(murf_ws_url)
+            self.api_key = api_key
+            # Initial connection message
+            await self.ws.send(dumps_text({"init": True}))
+            # Set voice config
+            voice_config = {"voice_config": MURF_VOICE_CONFIG}
+            await self.ws.send(dumps_text(voice_config))
+            log.info(f"Sent voice config: {voice_config}")
+        return self.ws
+
+    async def close(self):
+        if self.ws is not None:
+            try:
+                await self.ws.close()
+            except Exception:
+                pass
+            self.ws = None
+
+# Context blocks prepended to the prompt when weather/time data is available
+WEATHER_CONTEXT_TEMPLATE = (
+    "[WEATHER DATA FOR {query}]\n"
+    "Location: {location}\n"
+    "Temperature: {temperature}°C\n"
+    "Feels like: {feels_like}°C\n"
+    "Conditions: {description}\n"
+    "Humidity: {humidity}%\n"
+    "Wind Speed: {wind_speed} km/h\n"
+    "Pressure: {pressure} hPa\n"
+    "[/WEATHER DATA]"
+)
+TIMEZONE_CONTEXT_TEMPLATE = (
+    "[TIME DATA FOR {query}]\n"
+    "Timezone: {timezone}\n"
+    "Current Time: {current_time}\n"
+    "Current Date: {current_date}\n"
+    "UTC Offset: {utc_offset}\n"
+    "Day of Week: {day_of_week}\n"
+    "[/TIME DATA]"
+)
+DATE_DIFFERENCE_CONTEXT_TEMPLATE = (
+    "[DATE DIFFERENCE DATA]\n"
+    "Target Date: {date1}\n"
+    "Current Date: {date2}\n"
+    "Difference: {difference} {direction}\n"
+    "Total Days: {total_days} days\n"
+    "[/DATE DIFFERENCE DATA]"
+)
+DAY_OF_WEEK_CONTEXT_TEMPLATE = (
+    "[DAY OF WEEK DATA]\n"
+    "Date: {date}\n"
+    "Day of Week: {day_of_week}\n"
+    "Is Weekend: {is_weekend}\n"
+    "[/DAY OF WEEK DATA]"
+)
+CURRENT_TIME_CONTEXT_TEMPLATE = (
+    "[CURRENT TIME DATA]\n"
+    "Local Time: {local_time}\n"
+    "Local Date: {local_date}\n"
+    "UTC Time: {utc_time}\n"
+    "[/CURRENT TIME DATA]"
+)
+
+async def stream_gemini_response(transcript: str, websocket: WebSocket, murf_session: MurfSession) -> Optional[str]:
     """Stream Gemini response, send to Murf, save chat history, and forward audio to client."""
     try:
         # Check if user is asking about weather
@@ -433,20 +776,10 @@ async def stream_gemini_response(transcript: str, websocket: WebSocket) -> Optio
         
         if location:
             log.info(f"Weather request detected for location: {location}")
-            weather_data = get_weather_for_location(location)
+            weather_data = await get_weather_for_location(location)
             
             if "error" not in weather_data:
-                weather_context = f"""
-                [WEATHER DATA FOR {location.upper()}]
-                Location: {weather_data['location']}
-                Temperature: {weather_data['temperature']}°C
-                Feels like: {weather_data['feels_like']}°C
-                Conditions: {weather_data['description']}
-                Humidity: {weather_data['humidity']}%
-                Wind Speed: {weather_data['wind_speed']} km/h
-                Pressure: {weather_data['pressure']} hPa
-                [/WEATHER DATA]
-                """
+                weather_context = WEATHER_CONTEXT_TEMPLATE.format(query=location.upper(), **weather_data)
                 log.info(f"Weather data retrieved: {weather_data}")
             else:
                 weather_context = f"[WEATHER ERROR: {weather_data['error']}]"
@@ -462,15 +795,7 @@ async def stream_gemini_response(transcript: str, websocket: WebSocket) -> Optio
             if time_query["type"] == "timezone":
                 time_data = get_timezone_time(time_query["query"])
                 if "error" not in time_data:
-                    time_context = f"""
-                    [TIME DATA FOR {time_query['query'].upper()}]
-                    Timezone: {time_data['timezone']}
-                    Current Time: {time_data['current_time']}
-                    Current Date: {time_data['current_date']}
-                    UTC Offset: {time_data['utc_offset']}
-                    Day of Week: {time_data['day_of_week']}
-                    [/TIME DATA]
-                    """
+                    time_context = TIMEZONE_CONTEXT_TEMPLATE.format(query=time_query["query"].upper(), **time_data)
                     log.info(f"Timezone data retrieved: {time_data}")
                 else:
                     time_context = f"[TIME ERROR: {time_data['error']}]"
@@ -479,14 +804,7 @@ async def stream_gemini_response(transcript: str, websocket: WebSocket) -> Optio
             elif time_query["type"] == "date_difference":
                 date_data = calculate_date_difference(time_query["query"])
                 if "error" not in date_data:
-                    time_context = f"""
-                    [DATE DIFFERENCE DATA]
-                    Target Date: {date_data['date1']}
-                    Current Date: {date_data['date2']}
-                    Difference: {date_data['difference']} {date_data['direction']}
-                    Total Days: {date_data['total_days']} days
-                    [/DATE DIFFERENCE DATA]
-                    """
+                    time_context = DATE_DIFFERENCE_CONTEXT_TEMPLATE.format(**date_data)
                     log.info(f"Date difference data retrieved: {date_data}")
                 else:
                     time_context = f"[TIME ERROR: {date_data['error']}]"
@@ -495,27 +813,24 @@ async def stream_gemini_response(transcript: str, websocket: WebSocket) -> Optio
             elif time_query["type"] == "day_of_week":
                 day_data = get_day_of_week(time_query["query"])
                 if "error" not in day_data:
-                    time_context = f"""
-                    [DAY OF WEEK DATA]
-                    Date: {day_data['date']}
-                    Day of Week: {day_data['day_of_week']}
-                    Is Weekend: {'Yes' if day_data['is_weekend'] else 'No'}
-                    [/DAY OF WEEK DATA]
-                    """
+                    time_context = DAY_OF_WEEK_CONTEXT_TEMPLATE.format(
+                        date=day_data["date"],
+                        day_of_week=day_data["day_of_week"],
+                        is_weekend="Yes" if day_data["is_weekend"] else "No",
+                    )
                     log.info(f"Day of week data retrieved: {day_data}")
                 else:
                     time_context = f"[TIME ERROR: {day_data['error']}]"
                     log.warning(f"Day of week error: {day_data['error']}")
             
             elif time_query["type"] == "current_time":
-                local_time = datetime.now()
-                time_context = f"""
-                [CURRENT TIME DATA]
-                Local Time: {local_time.strftime('%I:%M %p')}
-                Local Date: {local_time.strftime('%A, %B %d, %Y')}
-                UTC Time: {datetime.now(pytz.UTC).strftime('%I:%M %p UTC')}
-                [/CURRENT TIME DATA]
-                """
+                utc_time = datetime.now(pytz.UTC)
+                local_time = utc_time.astimezone()
+                time_context = CURRENT_TIME_CONTEXT_TEMPLATE.format(
+                    local_time=local_time.strftime("%I:%M %p"),
+                    local_date=local_time.strftime("%A, %B %d, %Y"),
+                    utc_time=utc_time.strftime("%I:%M %p UTC"),
+                )
                 log.info(f"Current time data retrieved")
         
         # Prepare the prompt with context if available
@@ -534,88 +849,51 @@ async def stream_gemini_response(transcript: str, websocket: WebSocket) -> Optio
         
         # Use current API keys
         if not current_api_keys["gemini"]:
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "error",
                 "data": "Gemini API key not configured. Please set it in the configuration panel."
             })
             return None
         
-        # Create model with current API key
-        current_model = GenerativeModel(model_name="gemini-2.0-flash", api_key=current_api_keys["gemini"])
+        current_model = get_gemini_model(current_api_keys["gemini"])
         
-        response = await asyncio.to_thread(
-            current_model.generate_content,
-            prompt,
-            stream=True
-        )
-        accumulated_response = ""
+        response = await current_model.generate_content_async(prompt, stream=True)
         
         if not current_api_keys["murf"]:
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "error",
                 "data": "Murf API key not configured. Please set it in the configuration panel."
             })
             return None
         
-        murf_ws_url = f"{DEFAULT_MURF_WS_URL}?api_key={current_api_keys['murf']}&context_id={CONTEXT_ID}&format=WAV&sample_rate=44100&channel_type=MONO"
-        log.info(f"Attempting WebSocket connection to: {murf_ws_url}")
-        async with websockets.connect(murf_ws_url) as murf_ws:
-            # Initial connection message
-            await murf_ws.send(json.dumps({"init": True}))
-            # Set voice config
-            voice_config = {"voice_config": {"voiceId": "en-US-amara", "style": "Conversational"}}
-            await murf_ws.send(json.dumps(voice_config))
-            log.info(f"Sent voice config: {voice_config}")
-            for chunk in response:
-                if chunk.text:
-                    content = chunk.text
-                    accumulated_response += content
-                    log.info(f"Sending to Murf: {content}")
-                    await murf_ws.send(json.dumps({"text": content}))
-                    # Receive base64 audio from Murf
-                    murf_response = await murf_ws.recv()
-                    log.info(f"Received from Murf: {murf_response[:100]}...")
-                    murf_data = json.loads(murf_response)
-                    base64_audio = murf_data.get("audio", "")
-                    is_final = murf_data.get("is_final", False) if "is_final" in murf_data else False
-                    # Send base64 audio to client
-                    if base64_audio:
-                        try:
-                            await websocket.send_json({
-                                "type": "audio",
-                                "data": base64_audio,
-                                "is_final": is_final
-                            })
-                            log.info(f"Sent base64 audio to client (Final: {is_final}, Length: {len(base64_audio)})")
-                        except Exception as e:
-                            log.error(f"Failed to send audio to client: {e}")
-                    if is_final:
-                        break
-            # Continue receiving remaining audio chunks until final
-            while True:
-                try:
-                    murf_response = await asyncio.wait_for(murf_ws.recv(), timeout=5.0)
-                    log.info(f"Received additional from Murf: {murf_response[:100]}...")
-                    murf_data = json.loads(murf_response)
-                    base64_audio = murf_data.get("audio", "")
-                    is_final = murf_data.get("is_final", False)
-                    if base64_audio:
-                        await websocket.send_json({
-                            "type": "audio",
-                            "data": base64_audio,
-                            "is_final": is_final
-                        })
-                        log.info(f"Sent additional base64 audio to client (Final: {is_final}, Length: {len(base64_audio)})")
-                    if is_final:
-                        break
-                except asyncio.TimeoutError:
-                    log.warning("Timeout waiting for additional Murf audio, assuming complete")
-                    break
-        # Save chat history
+        async with murf_session.lock:
+            murf_ws = await murf_session.get()
+            # A fresh context per turn on the shared socket, so nothing left
+            # over from an earlier turn can be taken for this one
+            context_id = f"turn_{uuid.uuid4().hex}"
+            await murf_ws.send(dumps_text({"voice_config": MURF_VOICE_CONFIG, "context_id": context_id}))
+            # Bounded so a slow client pushes back on Murf instead of buffering audio
+            audio_queue: asyncio.Queue = asyncio.Queue(maxsize=AUDIO_QUEUE_SIZE)
+            send_task = asyncio.create_task(pump_gemini_to_murf(response, murf_ws, context_id))
+            recv_task = asyncio.create_task(pump_murf_audio(murf_ws, audio_queue, send_task, context_id))
+            client_task = asyncio.create_task(pump_audio_to_client(audio_queue, websocket))
+            tasks = (send_task, recv_task, client_task)
+            try:
+                accumulated_response, completed, _ = await asyncio.gather(*tasks)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            if not completed:
+                # Rare: Murf went quiet without its final message. Replies tagged
+                # with this context are dropped next turn, but untagged ones
+                # wouldn't be, so start the next turn on a fresh socket
+                await murf_session.close()
+        
+        # Save chat history without holding up the response
         if accumulated_response:
-            save_chat_history(transcript, accumulated_response)
+            run_in_background(save_chat_history(transcript, accumulated_response))
             # Send response text to client for display
-            await websocket.send_json({
+            await send_json(websocket, {
                 "type": "response",
                 "data": accumulated_response
             })
@@ -623,10 +901,14 @@ async def stream_gemini_response(transcript: str, websocket: WebSocket) -> Optio
         return accumulated_response
     except websockets.exceptions.ConnectionClosedError as e:
         log.error(f"Murf WebSocket connection closed: {e}")
+        # Reconnect on the next turn
+        await murf_session.close()
     except websockets.exceptions.InvalidStatusCode as e:
         log.error(f"Murf WebSocket error: HTTP {e.status_code} - {e.reason}")
     except Exception as e:
         log.error(f"Murf WebSocket error: {e}")
+        # The connection may hold stale audio from this turn; start fresh next time
+        await murf_session.close()
     return None
 
 # API Key management endpoints
@@ -654,6 +936,8 @@ async def update_api_keys(request: Request):
             log.info("AssemblyAI API key updated")
         
         if "gemini" in data and data["gemini"]:
+            if data["gemini"] != current_api_keys["gemini"]:
+                gemini_models.clear()
             current_api_keys["gemini"] = data["gemini"]
             configure(api_key=data["gemini"])
             updated = True
@@ -707,7 +991,7 @@ async def test_api_keys(request: Request):
         if "openweather" in data and data["openweather"]:
             try:
                 test_url = f"http://api.openweathermap.org/data/2.5/weather?q=London&appid={data['openweather']}"
-                response = requests.get(test_url, timeout=5)
+                response = await app.state.http.get(test_url, timeout=5)
                 if response.status_code == 200:
                     results["openweather"] = {"valid": True, "message": "OpenWeather key is valid"}
                 else:
@@ -731,157 +1015,248 @@ async def ws_handler(websocket: WebSocket):
     await websocket.accept()
     log.info("WebSocket connected")
 
-    py_audio: Optional[object] = None
     mic_stream: Optional[object] = None
-    audio_thread: Optional[threading.Thread] = None
-    stop_event = threading.Event()
-    recorded_frames: List[bytes] = []
-    frames_lock = threading.Lock()
+    audio_task: Optional[asyncio.Task] = None
+    # Single producer (PortAudio callback) / single consumer (stop) frame buffer;
+    # deque.append and popleft are atomic, so no lock is needed
+    recorded_frames: deque = deque(maxlen=MAX_RECORDED_FRAMES)
+
+    def drain_recorded_frames() -> List[bytes]:
+        frames = []
+        while True:
+            try:
+                frames.append(recorded_frames.popleft())
+            except IndexError:
+                return frames
 
     loop = asyncio.get_running_loop()
-    queue: asyncio.Queue[str] = asyncio.Queue()
+    # Work for pump_queue, as (handler coroutine function, argument): AssemblyAI
+    # events from the SDK threads, or websocket.send_text with a text message
+    queue: asyncio.Queue = asyncio.Queue()
+    # Microphone frames from the PortAudio callback to the sender thread; None
+    # ends the audio session
+    send_queue: Queue = Queue(maxsize=AAI_SEND_QUEUE_SIZE)
+    murf_session = MurfSession()
 
     # Buffers
-    all_transcripts = []
+    last_transcript = ""
     final_transcript = None
 
-    # Forward and log transcript text
-    async def forward_event(client, message):
-        nonlocal final_transcript
-        try:
-            if message.type == "Turn" and message.transcript:
-                transcript_text = message.transcript.strip()
-                all_transcripts.append(transcript_text)
-                log.info(f"Live Transcription: {transcript_text}")
-                await websocket.send_text(transcript_text)
-                if hasattr(message, "turn_is_formatted") and message.turn_is_formatted:
-                    final_transcript = transcript_text
-                    log.info(f"Final Formatted Transcription: {final_transcript}")
-            elif message.type == "Termination":
-                log.info("Turn ended detected")
-                if final_transcript or all_transcripts:
-                    await websocket.send_text(final_transcript or all_transcripts[-1])
-                await websocket.send_text("turn_ended")
-                if final_transcript:
-                    await stream_gemini_response(final_transcript, websocket)
-            elif message.type == "error":
-                error_msg = f"Error: {str(message)}"
-                log.error(error_msg)
-                await websocket.send_text(error_msg)
-        except Exception as e:
-            log.error(f"forward_event error: {e}")
+    # Short protocol messages, sent together as one JSON array frame by flush()
+    send_buffer: List[Dict] = []
+
+    async def flush():
+        if send_buffer:
+            messages = send_buffer.copy()
+            send_buffer.clear()
+            await send_json(websocket, messages)
+
+    # Gemini/Murf responses run as background tasks so neither the command
+    # loop nor pump_queue waits on them
+    response_tasks = set()
+
+    def start_response(transcript: str):
+        task = asyncio.create_task(stream_gemini_response(transcript, websocket, murf_session))
+        response_tasks.add(task)
+        task.add_done_callback(response_tasks.discard)
 
-    if not current_api_keys["aai"]:
-        await websocket.send_json({
+    async def end_turn():
+        text = final_transcript or last_transcript
+        # Nothing was said this turn; don't send empty frames
+        if not text:
+            return
+        send_buffer.append({"type": "final", "text": text})
+        send_buffer.append({"type": "turn_ended"})
+        await flush()
+
+    aai_key = current_api_keys["aai"]
+    if not aai_key:
+        await send_json(websocket, {
             "type": "error",
             "data": "AssemblyAI API key not configured. Please set it in the configuration panel."
         })
         return
     
     client = StreamingClient(
-        StreamingClientOptions(api_key=current_api_keys["aai"], api_host="streaming.assemblyai.com")
+        StreamingClientOptions(api_key=aai_key, api_host="streaming.assemblyai.com")
     )
-    client.on(StreamingEvents.Begin, lambda client, message: loop.call_soon_threadsafe(
-        lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
-    client.on(StreamingEvents.Turn, lambda client, message: loop.call_soon_threadsafe(
-        lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
-    client.on(StreamingEvents.Termination, lambda client, message: loop.call_soon_threadsafe(
-        lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
-    client.on(StreamingEvents.Error, lambda client, message: loop.call_soon_threadsafe(
-        lambda: asyncio.run_coroutine_threadsafe(forward_event(client, message), loop)))
+    # One straight-line handler per AssemblyAI event kind
+    async def on_turn(message):
+        nonlocal final_transcript, last_transcript
+        transcript_text = (message.transcript or "").strip()
+        if transcript_text:
+            last_transcript = transcript_text
+            log.info(f"Live Transcription: {transcript_text}")
+            await websocket.send_text(transcript_text)
+            if getattr(message, "turn_is_formatted", False):
+                final_transcript = transcript_text
+                log.info(f"Final Formatted Transcription: {final_transcript}")
+
+    async def on_termination(message):
+        log.info("Turn ended detected")
+        await end_turn()
+        if final_transcript:
+            start_response(final_transcript)
+
+    async def on_error(message):
+        error_msg = f"Error: {str(message)}"
+        log.error(error_msg)
+        await websocket.send_text(error_msg)
 
-    client.connect(StreamingParameters(sample_rate=SAMPLE_RATE, format_turns=True))
+    # SDK callbacks only hand (handler, message) over to the loop; pump_queue
+    # runs the handler. Begin carries nothing the client needs.
+    call_soon = loop.call_soon_threadsafe
+    put = queue.put_nowait
+    for event, handler in (
+        (StreamingEvents.Turn, on_turn),
+        (StreamingEvents.Termination, on_termination),
+        (StreamingEvents.Error, on_error),
+    ):
+        client.on(event, lambda client, message, handler=handler: call_soon(put, (handler, message)))
 
+    # connect/disconnect block on the AssemblyAI handshake; keep them off the loop
+    await asyncio.to_thread(client.connect, StreamingParameters(sample_rate=SAMPLE_RATE, format_turns=True))
+
+    # Single consumer: runs each queued handler in order
     async def pump_queue():
+        get = queue.get
+        task_done = queue.task_done
+        while True:
+            handler, message = await get()
+            try:
+                await handler(message)
+            except Exception as e:
+                log.error(f"pump_queue error: {e}")
+            finally:
+                task_done()
+
+    queue_task = asyncio.create_task(pump_queue())
+
+    def on_audio(in_data, frame_count, time_info, status):
+        # Runs on PortAudio's callback thread: hand the frame over and return
+        recorded_frames.append(in_data)
         try:
-            while True:
-                msg = await queue.get()
-                await websocket.send_text(msg)
-                queue.task_done()
+            send_queue.put_nowait(in_data)
+        except Full:
+            log.warning("AssemblyAI sender is behind; dropping mic frame")
+        return (None, pyaudio.paContinue)
+
+    def open_mic():
+        nonlocal mic_stream
+        if not HAS_PYAUDIO:
+            raise RuntimeError("PyAudio not available on this host. Use the UI without local mic streaming.")
+        mic_stream = get_pyaudio().open(
+            input=True,
+            format=FORMAT,
+            channels=CHANNELS,
+            rate=SAMPLE_RATE,
+            frames_per_buffer=FRAMES_PER_BUFFER,
+            stream_callback=on_audio,
+        )
+
+    def close_mic():
+        nonlocal mic_stream
+        try:
+            if mic_stream:
+                if mic_stream.is_active():
+                    mic_stream.stop_stream()
+                mic_stream.close()
         except Exception:
             pass
+        mic_stream = None
 
-    queue_task = asyncio.create_task(pump_queue())
+    def settle_sender(done: asyncio.Future, error: Optional[Exception]):
+        # Runs on the loop once the sender thread exits
+        if done.done():
+            return
+        if error is None:
+            done.set_result(None)
+        else:
+            done.set_exception(error)
 
-    def stream_audio():
-        nonlocal mic_stream, py_audio
-        log.info("Starting audio streaming thread")
+    # Sender thread: forwards captured frames to AssemblyAI until the None end
+    # marker, so a slow network write never holds up capture
+    def send_audio(frames: Queue, done: asyncio.Future):
+        get = frames.get
+        send_frames = client.stream
+        error = None
         try:
-            if not HAS_PYAUDIO:
-                raise RuntimeError("PyAudio not available on this host. Use the UI without local mic streaming.")
-            py_audio = pyaudio.PyAudio()
-            mic_stream = py_audio.open(
-                input=True,
-                format=FORMAT,
-                channels=CHANNELS,
-                rate=SAMPLE_RATE,
-                frames_per_buffer=FRAMES_PER_BUFFER,
-            )
-            while not stop_event.is_set():
-                try:
-                    data = mic_stream.read(FRAMES_PER_BUFFER, exception_on_overflow=False)
-                    with frames_lock:
-                        recorded_frames.append(data)
-                    client.stream(data)
-                except IOError as e:
-                    log.warning(f"Audio read error: {e}, retrying...")
-                    time.sleep(0.01)
+            while True:
+                data = get()
+                if data is None:
+                    break
+                send_frames(data)
         except Exception as e:
-            log.error(f"Audio thread error: {e}")
-            asyncio.run_coroutine_threadsafe(queue.put(f"Transcription error: {e}"), loop)
+            error = e
         finally:
-            try:
-                if mic_stream:
-                    if mic_stream.is_active():
-                        mic_stream.stop_stream()
-                    mic_stream.close()
-            except Exception:
-                pass
-            mic_stream = None
-            if py_audio:
+            loop.call_soon_threadsafe(settle_sender, done, error)
+
+    async def stream_audio():
+        log.debug("Starting audio streaming")
+        try:
+            await asyncio.to_thread(open_mic)
+            # A dedicated thread, not an executor worker: it lives for the whole session
+            sender_done = loop.create_future()
+            threading.Thread(
+                target=send_audio, args=(send_queue, sender_done), name="aai-sender", daemon=True
+            ).start()
+            await sender_done
+        except Exception as e:
+            log.error(f"Audio streaming error: {e}")
+            queue.put_nowait((websocket.send_text, f"Transcription error: {e}"))
+        finally:
+            await asyncio.to_thread(close_mic)
+            log.debug("Audio streaming ended")
+
+    async def stop_audio():
+        if audio_task is None or audio_task.done():
+            return
+        # Close the mic first so the end marker is queued after the last frame
+        await asyncio.to_thread(close_mic)
+        try:
+            await asyncio.to_thread(send_queue.put, None, timeout=5.0)
+        except Full:
+            # Sender is stuck; drop the backlog so it still sees the end marker
+            while True:
                 try:
-                    py_audio.terminate()
-                except Exception:
-                    pass
-                py_audio = None
-            log.info("Audio streaming thread ended")
+                    send_queue.get_nowait()
+                except Empty:
+                    break
+            send_queue.put_nowait(None)
+        await asyncio.wait({audio_task}, timeout=5.0)
+        audio_task.cancel()
 
     try:
         while True:
             try:
                 msg = await websocket.receive_text()
-                log.info(f"Received client command: {msg}")
+                log.debug("Received client command: %s", msg)
             except Exception as e:
                 log.error(f"WebSocket receive error: {e}")
                 break
 
             if msg == "start":
-                if audio_thread and audio_thread.is_alive():
+                if audio_task and not audio_task.done():
                     await websocket.send_text("Already transcribing")
                     continue
-                stop_event.clear()
-                with frames_lock:
-                    recorded_frames.clear()
-                all_transcripts.clear()
+                recorded_frames.clear()
+                send_queue = Queue(maxsize=AAI_SEND_QUEUE_SIZE)
+                last_transcript = ""
                 final_transcript = None
-                audio_thread = threading.Thread(target=stream_audio, daemon=True)
-                audio_thread.start()
+                audio_task = asyncio.create_task(stream_audio())
                 await websocket.send_text("Started transcription")
 
             elif msg == "stop":
-                stop_event.set()
-                if audio_thread and audio_thread.is_alive():
-                    audio_thread.join(timeout=5.0)
+                await stop_audio()
 
-                if final_transcript or all_transcripts:
-                    await websocket.send_text(final_transcript or all_transcripts[-1])
-                    await websocket.send_text("turn_ended")
-                    if final_transcript:
-                        await stream_gemini_response(final_transcript, websocket)
+                # Write the WAV in a worker thread; the response streams in the background
+                save_task = asyncio.create_task(save_wav(drain_recorded_frames()))
 
-                with frames_lock:
-                    saved = save_wav(recorded_frames.copy())
-                    recorded_frames.clear()
+                await end_turn()
+                if final_transcript:
+                    start_response(final_transcript)
+
+                saved = await save_task
 
                 await websocket.send_text(
                     "Stopped transcription"
@@ -891,14 +1266,13 @@ async def ws_handler(websocket: WebSocket):
             else:
                 await websocket.send_text(f"Unknown command: {msg}")
 
-            await asyncio.sleep(0.01)
-
     finally:
-        stop_event.set()
-        if audio_thread and audio_thread.is_alive():
-            audio_thread.join(timeout=5.0)
-        client.disconnect(terminate=True)
+        await stop_audio()
+        await asyncio.to_thread(client.disconnect, terminate=True)
         queue_task.cancel()
+        for task in list(response_tasks):
+            task.cancel()
+        await murf_session.close()
         log.info("WebSocket closed")
 
 if __name__ == "__main__":
@@ -910,4 +1284,14 @@ if __name__ == "__main__":
     print("📡 API keys can be configured in the sidebar")
     print("🌐 Open http://localhost:8000 in your browser")
     port = int(os.getenv("PORT", "8000"))
-    uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
+    # "auto" picks uvloop when installed (uvicorn[standard] ships it on POSIX).
+    # uvloop has no Windows build; use winloop there if available.
+    loop_impl = "auto"
+    if sys.platform == "win32":
+        try:
+            import winloop
+            winloop.install()
+            loop_impl = "none"  # keep the winloop policy installed above
+        except ImportError:
+            pass
+    uvicorn.run(app, host="0.0.0.0", port=port, loop=loop_impl)
\ No newline at end of file
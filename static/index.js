@@ -4,11 +4,14 @@ let audioContext = null;
 let audioQueue = [];
 let isPlaying = false;
 let nextStartTime = 0;
-let isFirstAudio = true;
+let decodeChain = Promise.resolve();
+let mediaStreams = []; // per-turn MP3 streams, played one after another
+let receivingStream = null; // the stream the current turn's chunks go to
+let turnChunks = []; // fallback: the current turn's MP3 bytes until is_final
 
-const SAMPLE_RATE = 44100; // Murf output sample rate
-const CHANNELS = 1;
-const BITS_PER_SAMPLE = 16;
+const SAMPLE_RATE = 24000; // Murf output sample rate (MP3)
+const MP3_MIME = "audio/mpeg";
+const canStreamMp3 = !!(window.MediaSource && MediaSource.isTypeSupported(MP3_MIME));
 
 // DOM elements
 const startBtn = document.getElementById("startBtn");
@@ -260,6 +263,7 @@ async function testAllApiKeys() {
 function connectWebSocket() {
     const scheme = window.location.protocol === "https:" ? "wss" : "ws";
     ws = new WebSocket(`${scheme}://${window.location.host}/ws`);
+    ws.binaryType = "arraybuffer";
 
     ws.onopen = () => {
         console.log("WebSocket opened");
@@ -269,16 +273,33 @@ function connectWebSocket() {
 
     ws.onmessage = async (event) => {
         const data = event.data;
+
+        // Handle binary audio frames: 1 flag byte (1 = final) followed by audio bytes
+        if (data instanceof ArrayBuffer) {
+            const isFinal = new Uint8Array(data, 0, 1)[0] === 1;
+            console.log("Audio chunk received, is_final:", isFinal, "length:", data.byteLength - 1);
+            await queueAudio(data.slice(1), isFinal);
+            return;
+        }
+
         console.log("WebSocket message received:", data.substring(0, 100) + "...");
 
-        // Handle JSON messages (audio or response)
+        // Handle batched protocol messages (JSON array)
+        if (data.startsWith("[")) {
+            try {
+                JSON.parse(data).forEach(handleBatchedMessage);
+            } catch (e) {
+                console.error("Error parsing batched message:", e);
+                updateStatus("Error: Invalid data received ❌");
+            }
+            return;
+        }
+
+        // Handle JSON messages (response or error)
         if (data.startsWith("{")) {
             try {
                 const jsonData = JSON.parse(data);
-                if (jsonData.type === "audio" && jsonData.data) {
-                    console.log("Audio chunk received, is_final:", jsonData.is_final, "length:", jsonData.data.length);
-                    await queueAudio(jsonData.data, jsonData.is_final);
-                } else if (jsonData.type === "response" && jsonData.data) {
+                if (jsonData.type === "response" && jsonData.data) {
                     appendToTranscription(`AI: ${jsonData.data}`);
                     await fetchChatHistory();
                 } else if (jsonData.type === "error" && jsonData.data) {
@@ -313,6 +334,16 @@ function connectWebSocket() {
     };
 }
 
+function handleBatchedMessage(message) {
+    if (message.type === "final" && message.text) {
+        appendToTranscription(message.text);
+    } else if (message.type === "turn_ended") {
+        handleTextMessage("turn_ended");
+    } else {
+        console.warn("Invalid batched message format:", message);
+    }
+}
+
 function handleTextMessage(data) {
     if (data === "Started transcription") {
         updateStatus("Status: Transcribing 🎤");
@@ -355,48 +386,115 @@ function initAudioContext() {
     }
 }
 
-function base64ToArrayBuffer(base64) {
-    const binaryString = atob(base64);
-    const len = binaryString.length;
-    const bytes = new Uint8Array(len);
-    for (let i = 0; i < len; i++) {
-        bytes[i] = binaryString.charCodeAt(i);
+// Murf sends one continuous MP3 per turn, cut at arbitrary byte offsets, so
+// chunks can't be decoded on their own. Stream them into a MediaSource where
+// supported; otherwise decode the whole turn once its final chunk arrives.
+function queueAudio(audioData, isFinal) {
+    if (canStreamMp3) {
+        appendToMediaStream(audioData, isFinal);
+    } else {
+        bufferTurnAudio(audioData, isFinal);
     }
-    return bytes.buffer;
 }
 
-async function queueAudio(base64Audio, isFinal) {
-    try {
-        let pcmBuffer = base64ToArrayBuffer(base64Audio);
-        if (isFirstAudio) {
-            console.log("First audio chunk: skipping 44-byte WAV header");
-            pcmBuffer = pcmBuffer.slice(44);
-            isFirstAudio = false;
+function appendToMediaStream(audioData, isFinal) {
+    if (!receivingStream) {
+        // An empty final frame with no audio before it has nothing to play
+        if (audioData.byteLength === 0) return;
+        receivingStream = createMediaStream();
+        mediaStreams.push(receivingStream);
+        if (mediaStreams.length === 1) {
+            playMediaStream(receivingStream);
         }
+    }
+    const stream = receivingStream;
+    if (audioData.byteLength > 0) {
+        stream.pending.push(audioData);
+    }
+    if (isFinal) {
+        stream.ended = true;
+        receivingStream = null;
+    }
+    pumpMediaStream(stream);
+}
 
-        const int16 = new Int16Array(pcmBuffer);
-        const float32 = new Float32Array(int16.length);
-        for (let i = 0; i < int16.length; i++) {
-            float32[i] = int16[i] / 32768;
+function createMediaStream() {
+    const mediaSource = new MediaSource();
+    const audio = new Audio();
+    const stream = { mediaSource, audio, sourceBuffer: null, pending: [], ended: false, url: URL.createObjectURL(mediaSource) };
+    // Play through the AudioContext unlocked by the Start click
+    const node = audioContext.createMediaElementSource(audio);
+    node.connect(audioContext.destination);
+
+    mediaSource.addEventListener("sourceopen", () => {
+        stream.sourceBuffer = mediaSource.addSourceBuffer(MP3_MIME);
+        stream.sourceBuffer.mode = "sequence";
+        stream.sourceBuffer.addEventListener("updateend", () => pumpMediaStream(stream));
+        pumpMediaStream(stream);
+    }, { once: true });
+
+    audio.addEventListener("ended", () => {
+        node.disconnect();
+        URL.revokeObjectURL(stream.url);
+        mediaStreams.shift();
+        if (mediaStreams.length > 0) {
+            playMediaStream(mediaStreams[0]);
+        } else {
+            console.log("Audio playback complete");
+            updateStatus("Status: Audio playback complete ✅");
         }
+    }, { once: true });
 
-        const audioBuffer = audioContext.createBuffer(CHANNELS, float32.length, SAMPLE_RATE);
-        audioBuffer.copyToChannel(float32, 0);
+    audio.src = stream.url;
+    return stream;
+}
 
-        console.log("Audio chunk processed, duration:", audioBuffer.duration, "isFinal:", isFinal);
-        audioQueue.push({ buffer: audioBuffer, isFinal });
-        playNextAudio();
-    } catch (error) {
-        console.error("Error processing audio:", error);
+function playMediaStream(stream) {
+    stream.audio.play().catch((error) => {
+        console.error("Error playing audio:", error);
         updateStatus("Error: Failed to play audio ❌");
+    });
+}
+
+// A SourceBuffer takes one append at a time; the rest wait for updateend
+function pumpMediaStream(stream) {
+    const sourceBuffer = stream.sourceBuffer;
+    if (!sourceBuffer || sourceBuffer.updating) return;
+    if (stream.pending.length > 0) {
+        sourceBuffer.appendBuffer(stream.pending.shift());
+    } else if (stream.ended && stream.mediaSource.readyState === "open") {
+        stream.mediaSource.endOfStream();
     }
 }
 
+function bufferTurnAudio(audioData, isFinal) {
+    turnChunks.push(audioData);
+    if (!isFinal) return;
+    const chunks = turnChunks;
+    turnChunks = [];
+    // decodeAudioData is async, so chain decodes to keep turns in order
+    decodeChain = decodeChain.then(async () => {
+        try {
+            const mp3 = await new Blob(chunks).arrayBuffer();
+            if (mp3.byteLength === 0) return;
+            const audioBuffer = await audioContext.decodeAudioData(mp3);
+
+            console.log("Turn audio decoded, duration:", audioBuffer.duration);
+            audioQueue.push(audioBuffer);
+            playNextAudio();
+        } catch (error) {
+            console.error("Error processing audio:", error);
+            updateStatus("Error: Failed to play audio ❌");
+        }
+    });
+    return decodeChain;
+}
+
 function playNextAudio() {
     if (isPlaying || audioQueue.length === 0) return;
 
     isPlaying = true;
-    const { buffer, isFinal } = audioQueue.shift();
+    const buffer = audioQueue.shift();
     const source = audioContext.createBufferSource();
     source.buffer = buffer;
     source.connect(audioContext.destination);
@@ -407,14 +505,13 @@ function playNextAudio() {
 
     source.onended = () => {
         isPlaying = false;
-        if (isFinal) {
-            audioQueue = [];
+        // Each queued buffer is a whole turn; play the next one if it's ready
+        if (audioQueue.length > 0) {
+            playNextAudio();
+        } else {
             nextStartTime = 0;
-            isFirstAudio = true;
             console.log("Audio playback complete");
             updateStatus("Status: Audio playback complete ✅");
-        } else {
-            playNextAudio();
         }
     };
 }
@@ -422,7 +519,6 @@ function playNextAudio() {
 // Control Functions
 function startTranscription() {
     initAudioContext();
-    isFirstAudio = true;
     ws.send("start");
 }
 